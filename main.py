@@ -1,91 +1,616 @@
-from importlib_metadata import metadata
-import pandas as pd
-import sqlalchemy as sa
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+import operator
+import os
+import tempfile
 import logging
 from logging import INFO
 import sys
+from typing import TYPE_CHECKING
+
+# pandas, sqlalchemy and pyarrow are imported where they are first used, so the script starts
+# (e.g. for --help) without paying for their import
+if TYPE_CHECKING:
+    import pandas as pd
+    import sqlalchemy as sa
 
 # configure logger for helpful debugging messages
 logging.basicConfig(format='[%(levelname)-5s][%(asctime)s][%(module)s:%(lineno)04d] : %(message)s',
                     level=INFO,
                     stream=sys.stderr)
-logger: logging.Logger = logging
+logger: logging.Logger = logging.getLogger(__name__)
+
+# column types to read the spotify csv files with, instead of letting pandas infer object/int64/float64 for everything.
+# low-cardinality text columns become categories and small counts become nullable integers
+ARTIST_DTYPES = {"artist_popularity": "Int16",
+                 "followers": "Int32",
+                 "genres": "category",
+                 "type": "category"}
+
+ALBUM_DTYPES = {"album_type": "category",
+                "release_date_precision": "category",
+                "total_tracks": "Int16",
+                "available_markets": "string",
+                # release dates mix "1998", "2005-03" and "2019-11-22" precisions and are stored as text, so they
+                # are read as text too rather than letting a chunk of year-only dates be inferred as numbers
+                "release_date": "object",
+                "type": "category"}
+
+# key column count from which add_index adds the columns up one by one rather than with a single str.cat,
+# which converts every column before joining them
+_REDUCE_MIN_COLUMNS = 3
+
+# MySQL error codes for LOAD DATA LOCAL INFILE being disabled on the server or client, on which
+# load_to_db falls back to batched inserts
+_LOCAL_INFILE_REJECTED = (1148, 2068, 3948)
+
+# bytes of csv pyarrow parses per block (and so per record batch), when pyarrow is installed
+ARROW_BLOCK_SIZE = 8 << 20
+
+
+@functools.lru_cache(maxsize=None)
+def _pandas():
+    """
+    Imports pandas the first time it is needed
+
+    Returns:
+        module: the pandas module
+    """
+    import pandas as pd
+    # copy-on-write makes dataframe copies lazy, so the chunks handed between DataLoader's transforms are never
+    # copied just in case. pandas 3 always has it on and older versions before 1.5 don't have it
+    if int(pd.__version__.split(".")[0]) < 3:
+        try:
+            pd.set_option("mode.copy_on_write", True)
+        except KeyError:
+            pass
+    return pd
+
+
+@functools.lru_cache(maxsize=None)
+def _has_pyarrow() -> bool:
+    """
+    Checks whether pyarrow is installed. pyarrow is optional, without it the csv files are parsed by
+    pandas' own (single-threaded) C engine
+
+    Returns:
+        bool: True if pyarrow can be imported
+    """
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def spotify_metadata() -> sa.MetaData:
+    """
+    Builds the sqlalchemy MetaData object holding the information/structure of the spotify tables. It is built once,
+    on first use, so db_create_tables can be called repeatedly and load_to_db can insert through its tables
+
+    Returns:
+        sa.MetaData: metadata with the spotify_artists and spotify_albums tables
+    """
+    import sqlalchemy as sa
+    meta = sa.MetaData()
+
+    # defining the table name and its structure and columns
+    spotify_artists_table = sa.Table("spotify_artists", meta,
+                                     sa.Column("id", sa.String(256), primary_key=True),
+                                     sa.Column("name", sa.String(256)),
+                                     sa.Column("artist_popularity", sa.Integer),
+                                     sa.Column("followers", sa.String(256)),
+                                     sa.Column("genres", sa.String(256)),
+                                     sa.Column("track_id", sa.String(256)),
+                                     sa.Column("track_id_prev", sa.String(256)),
+                                     sa.Column("type", sa.String(256)))
+    # index artist names so the database can serve "ORDER BY name" instead of the rows being pre-sorted
+    sa.Index("ix_spotify_artists_name", spotify_artists_table.c.name)
+
+    sa.Table("spotify_albums", meta,
+             sa.Column("id", sa.String(256), primary_key=True),
+             sa.Column("name", sa.String(256)),
+             sa.Column("album_type", sa.String(256)),
+             sa.Column("artist_id", sa.String(256)),
+             # a python-style list of market codes (not JSON) that can outgrow a VARCHAR(1000)
+             sa.Column("available_markets", sa.Text),
+             sa.Column("external_urls", sa.String(1000)),
+             sa.Column("href", sa.String(1000)),
+             sa.Column("images", sa.String(1000)),
+             sa.Column("release_date", sa.String(256)),
+             sa.Column("release_date_precision", sa.String(256)),
+             sa.Column("total_tracks", sa.Integer),
+             sa.Column("track_id", sa.String(256)),
+             sa.Column("track_name_prev", sa.String(256)),
+             sa.Column("uri", sa.String(256)),
+             sa.Column("type", sa.String(256)),
+             # the albums rows are wide and repetitive text, compressed pages store them in far less space
+             mysql_row_format="COMPRESSED",
+             mysql_key_block_size="8")
+    return meta
+
+
+def table_columns(db_table_name:str) -> list:
+    """
+    Lists the columns of one of the spotify tables, the only csv columns written to it
+
+    Args:
+        db_table_name (str): name of the table, one of the tables in spotify_metadata()
+
+    Returns:
+        list: the table's column names
+    """
+    return [column.name for column in spotify_metadata().tables[db_table_name].columns]
+
+
+def _arrow_type(dtype):
+    """
+    Maps a pandas dtype to the pyarrow type the csv column is parsed as
+
+    Args:
+        dtype (str or dtype): pandas dtype name or object, from the caller's dtypes or the head chunk's inferred dtypes
+
+    Returns:
+        pa.DataType: pyarrow type to parse the column with
+    """
+    import pyarrow as pa
+    pd = _pandas()
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pa.dictionary(pa.int32(), pa.string())
+    if pd.api.types.is_bool_dtype(dtype):
+        # parsed from "True"/"False", not converted from the string, which would make every non-empty value True
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(dtype):
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            # parsed as floats so that values like "10.0" convert too, then cast to the nullable pandas integer
+            return pa.float64()
+        return pa.int64()
+    if pd.api.types.is_float_dtype(dtype):
+        return pa.float64()
+    # text, and dates, which are parsed from text afterwards like read_csv's parse_dates
+    return pa.string()
+
+
+def _as_text(values:pd.Series) -> pd.Series:
+    """
+    Converts a column to strings, rendering missing values as python renders the column's own missing value
+    ("nan", or "<NA>" for nullable columns), as the row-wise join did
+
+    Args:
+        values (pd.Series): dataframe column
+
+    Returns:
+        pd.Series: the column as strings
+    """
+    return values.astype("string").fillna(str(getattr(values.dtype, "na_value", "nan")))
+
+
+def _concat_columns(df:pd.DataFrame, column_names:list):
+    """
+    Concatenates the values of several dataframe columns by a dash "-"
+
+    Args:
+        df (pd.DataFrame): dataframe (or chunk of one)
+        column_names (list): list of columns to concatenate
+
+    Returns:
+        array-like: the concatenated value of every row
+    """
+    pd = _pandas()
+    arrays = [df[c].to_numpy() for c in column_names]
+    if all(pd.api.types.infer_dtype(a, skipna=False) == "string" for a in arrays):
+        # columns holding nothing but python strings are added together as numpy object arrays,
+        # skipping the conversion to pandas string arrays
+        values = arrays[0]
+        for a in arrays[1:]:
+            values = values + "-" + a
+        return values
+    if len(column_names) >= _REDUCE_MIN_COLUMNS:
+        # the separator is attached to every column but the last as it is converted, then the columns are added up
+        # one at a time, so only the running total and the next column are held in memory instead of every column
+        last = len(column_names) - 1
+        cols = (_as_text(df[c]) + ("-" if i < last else "") for i, c in enumerate(column_names))
+        return functools.reduce(operator.add, cols)
+    # concatenating the specified column values across the index, one whole column at a time
+    cols = [_as_text(df[c]) for c in column_names]
+    return cols[0].str.cat(cols[1:], sep="-")
+
+
+def _add_index(df:pd.DataFrame, index_name:str, column_names:list, hashed:bool = False) -> pd.DataFrame:
+    """
+    Concatenates column values of a dataframe by a dash "-" and sets the result as its index
+
+    Args:
+        df (pd.DataFrame): dataframe (or chunk of one) to index
+        index_name (str): the index column name
+        column_names (list): list of columns to concatenate into an index column
+        hashed (bool): index by a uint64 hash of the columns instead, without building their concatenation
+
+    Returns:
+        pd.DataFrame: the indexed dataframe
+    """
+    pd = _pandas()
+    if hashed:
+        # the key columns are hashed as text, so a value hashes the same in every chunk whatever dtype the chunk
+        # inferred for its column (e.g. a chunk of year-only dates read as integers)
+        keys = df[column_names]
+        # columns already holding nothing but strings are hashed as they are, only the others are converted
+        untyped = {c: str for c in column_names if pd.api.types.infer_dtype(keys[c].to_numpy(), skipna=False) != "string"}
+        if untyped:
+            keys = keys.astype(untyped)
+        # a single C-level pass hashes the key columns into 8 bytes per row, instead of a python string per row
+        hashes = pd.util.hash_pandas_object(keys, index=False)
+        df.index = pd.Index(hashes.to_numpy(), name=f"{index_name}_hash")
+        return df
+    if len(column_names) == 1:
+        column = df[column_names[0]]
+        if pd.api.types.infer_dtype(column.to_numpy(), skipna=False) == "string":
+            # a single text column needs no concatenation, it becomes the index as it is and stays a column too
+            df.set_index(column_names[0], drop=False, inplace=True)
+            df.index.name = index_name
+        else:
+            # other values are indexed as text, as the row-wise join made them
+            df.index = pd.Index(_as_text(column), name=index_name)
+        return df
+    df[index_name] = _concat_columns(df, column_names)
+    # set newly created index name as the dataframe's index
+    df.set_index(index_name, inplace=True)
+    return df
+
+
+def _sort(df:pd.DataFrame, column_name:str) -> pd.DataFrame:
+    """
+    Sorts a dataframe by a particular column
+
+    Args:
+        df (pd.DataFrame): dataframe (or chunk of one) to sort
+        column_name (str): column name to sort by
+
+    Returns:
+        pd.DataFrame: the sorted dataframe
+    """
+    # mergesort is stable, so rows with equal values keep their csv order. An unnamed (row number) index isn't kept
+    return df.sort_values(by=column_name, kind="mergesort", ignore_index=df.index.name is None)
+
+
+def _index_as_column(df:pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns a named dataframe index (such as one set by add_index) back into a regular column
+
+    Args:
+        df (pd.DataFrame): dataframe (or chunk of one)
+
+    Returns:
+        pd.DataFrame: the dataframe with its named index as a column
+    """
+    if df.index.name is None or df.index.name in df.columns:
+        return df
+    return df.reset_index()
+
+
+def _records(df:pd.DataFrame, table:sa.Table) -> list:
+    """
+    Converts a dataframe to a list of row dicts for a table insert, keeping only the table's columns,
+    writing dates as text (as to_csv does for LOAD DATA) and turning missing values into None (NULL)
+
+    Args:
+        df (pd.DataFrame): dataframe (or chunk of one)
+        table (sa.Table): table the rows will be inserted into
+
+    Returns:
+        list: one dict per dataframe row
+    """
+    df = df[[c for c in df.columns if c in table.c]]
+    missing = df.isna()
+    # drivers such as sqlite3 can't bind pandas Timestamps
+    dates = df.select_dtypes(include=["datetime", "datetimetz"]).columns
+    df = df.astype({c: str for c in dates}).astype(object)
+    return df.where(~missing, None).to_dict("records")
+
+
+def _escape_backslashes(df:pd.DataFrame) -> pd.DataFrame:
+    """
+    Doubles the backslashes in a dataframe's text columns, so LOAD DATA (escaping with a backslash) reads them literally
+
+    Args:
+        df (pd.DataFrame): dataframe (or chunk of one)
+
+    Returns:
+        pd.DataFrame: the dataframe with escaped text columns
+    """
+    pd = _pandas()
+
+    def escape(value):
+        return value.replace("\\", "\\\\") if isinstance(value, str) else value
+
+    escaped = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            escaped[column] = values.cat.rename_categories(escape)
+        elif pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype):
+            if pd.api.types.infer_dtype(values, skipna=True) == "string":
+                # vectorised for the usual all-text column, missing values are left missing
+                escaped[column] = values.str.replace("\\", "\\\\", regex=False)
+            else:
+                escaped[column] = values.map(escape)
+    return df.assign(**escaped) if escaped else df
+
+
+@contextlib.contextmanager
+def _connection(db_engine):
+    """
+    Yields a connection for a SqlAlchemy engine (in a transaction) or the connection itself if one is given
+
+    Args:
+        db_engine (SqlAlchemy Engine): SqlAlchemy engine (or connection)
+    """
+    import sqlalchemy as sa
+    if isinstance(db_engine, sa.engine.Connection):
+        yield db_engine
+    else:
+        with db_engine.begin() as conn:
+            yield conn
+
 
 class DataLoader():
 
-    def __init__(self, filepath:str) -> None:
+    def __init__(self, filepath:str, chunksize:int = 50_000, dtypes:dict = None, parse_dates:list = None,
+                 usecols:list = None) -> None:
         """
-        Loads a CSV file path into a Dataframe
-        
+        Prepares a CSV file path to be streamed into Dataframes, one chunk of rows at a time.
+        Only the first chunk is read up front and kept in memory for head() and info().
+
         Args:
             filepath (str): file path to the CSV file
+            chunksize (int): number of rows read per chunk, defaults to 50,000
+            dtypes (dict): column name to pandas dtype mapping, such as ARTIST_DTYPES. Defaults to pandas' own inference
+            parse_dates (list): columns to parse as dates. Defaults to None
+            usecols (list): columns to read, such as table_columns("spotify_artists"), skipping the rest of the file's columns.
+                Columns the file doesn't have are logged and ignored. Defaults to reading every column
+
+        Raises:
+            ValueError: if the file has none of the usecols columns
         """
-        # read the csv file into a dataframe using pandas
-        df = pd.read_csv(filepath, header=0)
-        # assign this class instance variable to the dataframe 'df'
-        self.df = df
+        pd = _pandas()
+        self._path = filepath
+        self._chunksize = chunksize
+        self._dtypes = dtypes
+        self._parse_dates = parse_dates
+        # column names as pandas reads them (e.g. "Unnamed: 0"), so both csv engines produce the same columns
+        self._columns = list(pd.read_csv(filepath, header=0, nrows=0).columns)
+        self._usecols = None
+        if usecols is not None:
+            missing = [c for c in usecols if c not in self._columns]
+            if missing:
+                logger.warning("%s has no column(s) %s, they won't be loaded", filepath, missing)
+            # kept in file order, the order pandas returns usecols columns in
+            self._usecols = [c for c in self._columns if c in usecols]
+            if not self._usecols:
+                raise ValueError(f"{filepath} has none of the columns {list(usecols)}")
+        # transformations (add_index, sort) replayed on every chunk as it is read
+        self._transforms = []
+        # keep the first chunk of the csv file so head() and info() don't rescan the file
+        self.df = pd.read_csv(filepath, header=0, nrows=chunksize, dtype=dtypes, parse_dates=parse_dates,
+                              usecols=self._usecols)
+        # dtypes pandas inferred for the first chunk, before any transformation, used to type the pyarrow reader's columns
+        self._head_dtypes = self.df.dtypes.to_dict()
 
     def head(self) -> None:
         """
         prints the head of the dataframe to console
         """
-        # assign 'df' variable of this specific method to the instance's dataframe
-        df = self.df
-        return df.head()
+        return self.df.head()
 
     def info(self):
         """
-        calls pandas.info on the dataframe
+        calls pandas.info on the first chunk of the dataframe
         """
-        df = self.df
-        return df.info()
+        return self.df.info()
 
-    def add_index(self, index_name:str, column_names:list) -> None:
+    def iter_chunks(self):
+        """
+        Reads the CSV file chunk by chunk, applying the loader's transformations to each chunk
+
+        Yields:
+            pd.DataFrame: the next chunk of the CSV file
+        """
+        if _has_pyarrow():
+            reader = self._read_arrow_chunks()
+        else:
+            reader = _pandas().read_csv(self._path, header=0, chunksize=self._chunksize,
+                                        dtype=self._dtypes, parse_dates=self._parse_dates, usecols=self._usecols)
+        for chunk in reader:
+            for transform in self._transforms:
+                chunk = transform(chunk)
+            yield chunk
+
+    def _read_arrow_chunks(self):
+        """
+        Reads the CSV file with pyarrow's multithreaded parser, converting it to pandas chunks of at least `chunksize` rows
+
+        Yields:
+            pd.DataFrame: the next chunk of the CSV file
+        """
+        import pyarrow.csv as pa_csv
+        # columns the caller typed keep their dtype, the rest take the type pandas inferred for the head chunk
+        dtypes = {**self._head_dtypes, **(self._dtypes or {})}
+        # large blocks give the parser threads more work per block and fewer, bigger record batches
+        read_options = pa_csv.ReadOptions(column_names=self._columns, skip_rows=1, block_size=ARROW_BLOCK_SIZE)
+        # quoted values may contain newlines, which pandas' C engine accepts too
+        parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+        # every read column gets an explicit type, so a type guessed from the first block can't break on a later one
+        convert_options = pa_csv.ConvertOptions(column_types={c: _arrow_type(dtypes[c]) for c in self._columns
+                                                              if c in dtypes},
+                                                strings_can_be_null=True)
+        if self._usecols:
+            # an empty include_columns means every column, so it is only set when usecols narrows them down
+            convert_options.include_columns = self._usecols
+        batches, start = [], 0
+        rows = 0
+        for batch in pa_csv.open_csv(self._path, read_options=read_options, parse_options=parse_options,
+                                     convert_options=convert_options):
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= self._chunksize:
+                yield self._arrow_to_pandas(batches, start)
+                batches, start = [], start + rows
+                rows = 0
+        if batches:
+            yield self._arrow_to_pandas(batches, start)
+
+    def _arrow_to_pandas(self, batches:list, start:int) -> pd.DataFrame:
+        """
+        Converts pyarrow record batches to a pandas chunk with the same dtypes and index pandas' csv reader would give
+
+        Args:
+            batches (list): pyarrow record batches read from the CSV file
+            start (int): row number of the first row in the batches
+
+        Returns:
+            pd.DataFrame: the chunk of the CSV file
+        """
+        import pyarrow as pa
+        pd = _pandas()
+        # split_blocks keeps one pandas block per column, so columns aren't copied into consolidated 2D blocks
+        df = pa.Table.from_batches(batches).to_pandas(split_blocks=True)
+        df.index = pd.RangeIndex(start, start + len(df))
+        if self._dtypes:
+            df = df.astype({c: t for c, t in self._dtypes.items() if c in df.columns})
+        for column in self._parse_dates or []:
+            try:
+                df[column] = pd.to_datetime(df[column])
+            except (ValueError, TypeError):
+                # like read_csv's parse_dates, a column that can't be parsed is left as it is
+                pass
+        return df
+
+    def add_index(self, index_name:str, column_names:list, hashed:bool = False) -> None:
         """
         Create a dataframe index column from concatenating a series of column values. Column values are concatenated by a dash "-".
 
         For example if you have three columns such as: artist="Metallica", song="Ride the Lighting"
         the index would be ""Metallica-Ride the Lighting"
 
+        Column values must be coercible to strings; the concatenation is done column-wise
+        with pandas string methods rather than row by row. The index is added to every chunk as it is read.
+
+        With `hashed`, the index is instead a uint64 hash of the columns (named "<index_name>_hash"), which takes
+        8 bytes per row and sorts/compares as an integer. The concatenated value isn't built at all.
+
         Args:
             index_name (str): the index column name
             column_names (list): list of columns to concatenate into an index column
+            hashed (bool): index by a hash of the columns instead of their concatenation. Defaults to False
         """
-        df = self.df
         # use logger to log what the function is attempting to do
-        logger.info(f"\tAdding index '{index_name}'")
-        # concatenating the specified column values across the index
-        df[index_name] = df[column_names].apply(lambda row:"-".join(row.values.astype(str)), axis=1)
-        # set newly created index name as the dataframe's index
-        df.set_index(index_name, inplace=True)
-        self.df = df
+        logger.info("\tAdding index '%s'", index_name)
+        transform = functools.partial(_add_index, index_name=index_name, column_names=column_names, hashed=hashed)
+        self._transforms.append(transform)
+        self.df = transform(self.df)
 
 
     def sort(self, column_name:str) -> None:
         """
-        Sorts the dataframe by a particular column
+        Sorts the dataframe by a particular column. Each chunk is sorted on its own as it is read.
+
+        Deprecated for dataframes loaded to a database: the rows are not sorted across chunks, and the tables
+        from db_create_tables index the columns they are ordered by (such as ix_spotify_artists_name) so
+        "ORDER BY" is served by the database. Use it only to inspect the first chunk with head()/info().
 
         Args:
             column_name (str): column name to sort by
         """
-        df = self.df
-        # sort by dataframe column values
-        return df.sort_values(by=column_name)
+        transform = functools.partial(_sort, column_name=column_name)
+        self._transforms.append(transform)
+        self.df = transform(self.df)
         
 
-    def load_to_db(self, db_engine, db_table_name:str) -> None:
+    def load_to_db(self, db_engine, db_table_name:str, batch_size:int = 1000) -> None:
         """
-        Loads the dataframe into a database table.
+        Loads the dataframe into a database table, one chunk at a time.
 
         Args:
-            db_engine (SqlAlchemy Engine): SqlAlchemy engine (or connection) to use to insert into database
-            db_table_name (str): name of database table to insert to
+            db_engine (SqlAlchemy Engine): SqlAlchemy connection (or engine) to use to insert into database.
+                Passing a connection keeps the load inside the caller's transaction
+            db_table_name (str): name of database table to insert to, one of the tables in spotify_metadata()
+            batch_size (int): number of rows sent with each INSERT when LOAD DATA LOCAL INFILE isn't used,
+                defaults to 1000. Smaller batches suit tables with wide rows
         """
-        
-        df = self.df
-        logger.info(f"Loading {db_table_name} to database...")
-        # loads the sql tables created from the dataframe into a database using a sqlalchemy engine, replacing any tables that already exist
-        df.to_sql(db_table_name, db_engine, if_exists="replace")
+        import sqlalchemy as sa
+        logger.info("Loading %s to database...", db_table_name)
+        table = spotify_metadata().tables[db_table_name]
+        if db_engine.dialect.name in ("mysql", "mariadb"):
+            try:
+                self._load_data_infile(db_engine, table)
+                return
+            except sa.exc.OperationalError as error:
+                if error.orig is None or error.orig.args[0] not in _LOCAL_INFILE_REJECTED:
+                    raise
+                # e.g. MySQL 8, which ships with local_infile=OFF on the server
+                logger.warning("LOAD DATA LOCAL INFILE was rejected (%s), inserting %s in batches instead",
+                               error.orig, db_table_name)
+        self._insert(db_engine, table, batch_size)
+
+    def _insert(self, db_engine, table:sa.Table, batch_size:int) -> None:
+        """
+        Empties a table and inserts every chunk into it with batched INSERT statements, keeping the
+        table's schema from db_create_tables. Columns the table doesn't have are skipped.
+
+        Args:
+            db_engine (SqlAlchemy Engine): SqlAlchemy engine (or connection)
+            table (sa.Table): table to insert to
+            batch_size (int): number of rows sent with each INSERT
+        """
+        with _connection(db_engine) as conn:
+            # empty the table created by db_create_tables, keeping its schema
+            conn.execute(table.delete())
+            for chunk in self.iter_chunks():
+                records = _records(_index_as_column(chunk), table)
+                # the insert statement is compiled once and executed with batch_size rows at a time
+                for start in range(0, len(records), batch_size):
+                    conn.execute(table.insert(), records[start:start + batch_size])
+
+    def _load_data_infile(self, db_engine, table:sa.Table) -> None:
+        """
+        Empties a MySQL table and bulk loads every chunk into it with LOAD DATA LOCAL INFILE, keeping the
+        table's schema from db_create_tables. Columns the table doesn't have are skipped.
+
+        Args:
+            db_engine (SqlAlchemy Engine): SqlAlchemy engine (or connection) created with local_infile enabled
+            table (sa.Table): table to insert to
+        """
+        pd = _pandas()
+        quote = db_engine.dialect.identifier_preparer.quote
+        # the csv lines must end in "\n" as the LOAD DATA statement says, not os.linesep.
+        # pandas 1.5 renamed to_csv's line_terminator argument to lineterminator
+        pandas_version = tuple(int(v) for v in pd.__version__.split(".")[:2])
+        line_terminator = {"lineterminator" if pandas_version >= (1, 5) else "line_terminator": "\n"}
+        with _connection(db_engine) as conn:
+            conn.exec_driver_sql(f"TRUNCATE TABLE {quote(table.name)}")
+            for chunk in self.iter_chunks():
+                chunk = _index_as_column(chunk)
+                # csv columns missing from the table are read into a throwaway user variable
+                columns = ", ".join(quote(c) if c in table.c else "@skip" for c in chunk.columns)
+                fd, path = tempfile.mkstemp(suffix=".csv")
+                os.close(fd)
+                try:
+                    # \N is read as a NULL value by LOAD DATA, and can't be confused with text such as "NULL"
+                    # (or a literal \N) since backslashes in the text are escaped
+                    _escape_backslashes(chunk).to_csv(path, index=False, header=False, na_rep="\\N",
+                                                      **line_terminator)
+                    conn.exec_driver_sql(f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' "
+                                         f"INTO TABLE {quote(table.name)} "
+                                         "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+                                         f"LINES TERMINATED BY '\\n' ({columns})")
+                finally:
+                    os.remove(path)
 
 
 
@@ -102,68 +627,39 @@ def db_engine(db_host:str, db_user:str, db_pass:str, db_name:str="spotify") -> s
     Returns:
         sa.engine.Engine: sqlalchemy engine
     """
+    import sqlalchemy as sa
     connection_method = "mysql+pymysql"
     # create a sqlalchemy engine, assigning to variable 'engine'
-    engine = sa.create_engine(f"{connection_method}://{db_user}:{db_pass}@{db_host}/{db_name}", future=True)
+    # local_infile lets load_to_db bulk load csv chunks with LOAD DATA LOCAL INFILE.
+    # a small fixed pool is enough for the loader; pre_ping and recycle replace connections the server has closed
+    engine = sa.create_engine(f"{connection_method}://{db_user}:{db_pass}@{db_host}/{db_name}", future=True,
+                              connect_args={"local_infile": True},
+                              pool_size=4, max_overflow=0, pool_pre_ping=True, pool_recycle=3600)
     return engine
 
 
 def db_create_tables(db_engine, drop_first:bool = False) -> None:
     """
-    Using SqlAlchemy Metadata class create two spotify tables (including their schema columns and types)
+    Using the spotify_metadata() SqlAlchemy MetaData create the two spotify tables (including their schema columns and types)
     for **artists** and **albums**.
 
 
     Args:
-        db_engine (SqlAlchemy Engine): SqlAlchemy engine to bind the metadata to.
+        db_engine (SqlAlchemy Engine): SqlAlchemy engine (or connection) to create the tables with.
         drop_first (bool): Drop the tables before creating them again first. Default to False
     """
-    # create a sqlalchemy MetaData object to hold the information/structure of the tables to be created, and bind it to a sqlalchemy engine to send the information to a database
-    meta = sa.MetaData(bind=db_engine)
-    
-
-    logger.info("Creating spotify_artists table")
-    # defining the table name and its structure and columns
-    spotify_artists_table = sa.Table("spotify_artists", meta,
-                                sa.Column("id", sa.String(256), primary_key=True),
-                                sa.Column("name", sa.String(256)),
-                                sa.Column("artist_popularity", sa.Integer),
-                                sa.Column("followers", sa.String(256)),
-                                sa.Column("genres", sa.String(256)),
-                                sa.Column("track_id", sa.String(256)),
-                                sa.Column("track_id_prev", sa.String(256)),
-                                sa.Column("type", sa.String(256)))
-
-
-    logger.info("Creating spotify_albums table")
-    spotify_albums_table = sa.Table("spotify_albums", meta,
-                                sa.Column("id", sa.String(256), primary_key=True),
-                                sa.Column("name", sa.String(256)),
-                                sa.Column("album_type", sa.String(256)),
-                                sa.Column("artist_id", sa.String(256)),
-                                sa.Column("available_markets", sa.String(1000)),
-                                sa.Column("external_urls", sa.String(1000)),
-                                sa.Column("href", sa.String(1000)),
-                                sa.Column("images", sa.String(1000)),
-                                sa.Column("release_date", sa.String(256)),
-                                sa.Column("release_date_precision", sa.String(256)),
-                                sa.Column("total_tracks", sa.Integer),
-                                sa.Column("track_id", sa.String(256)),
-                                sa.Column("track_name_prev", sa.String(256)),
-                                sa.Column("uri", sa.String(256)),
-                                sa.Column("type", sa.String(256)))
-
-                                
+    meta = spotify_metadata()
     if drop_first:
         logger.info("Dropping existing tables before creating new ones")
-        meta.drop_all()
+        meta.drop_all(db_engine)
     logger.info("create_all()")
     # using the metadata, create all the specified tables in the database that the engine is connected to
     meta.create_all(db_engine, checkfirst=True)
     # log the names of the newly created tables
-    logger.info(meta.tables.keys())
+    logger.info("%s", meta.tables.keys())
 
-def main():
+def main(db_host:str = "127.0.0.1:3306", db_user:str = "root", db_pass:str = "mysql", db_name:str = "spotify",
+         data_dir:str = "./data") -> None:
     """
     Pipeline Orchestration method.
 
@@ -172,14 +668,24 @@ def main():
     - prints the head for both instances
     - Sets artists index to id column
     - Sets albums index to artist_id, name, and release_date
-    - Sorts artists by name
     - creates database engine
     - creates database metadata tables/columns
     - loads both artists and albums into database
+
+    Args:
+        db_host (str): database host and port settings, defaults to "127.0.0.1:3306"
+        db_user (str): database user, defaults to "root"
+        db_pass (str): database password, defaults to "mysql"
+        db_name (str): database name, defaults to "spotify"
+        data_dir (str): directory holding spotify_artists.csv and spotify_albums.csv, defaults to "./data"
     """
-    # reading csv files into a dataframe with the DataLoader class
-    artists_df = DataLoader("./data/spotify_artists.csv")
-    albums_df = DataLoader("./data/spotify_albums.csv")
+    # reading csv files into a dataframe with the DataLoader class, both files at the same time
+    with ThreadPoolExecutor(2) as executor:
+        artists_future = executor.submit(DataLoader, os.path.join(data_dir, "spotify_artists.csv"),
+                                         dtypes=ARTIST_DTYPES, usecols=table_columns("spotify_artists"))
+        albums_future = executor.submit(DataLoader, os.path.join(data_dir, "spotify_albums.csv"),
+                                        dtypes=ALBUM_DTYPES, usecols=table_columns("spotify_albums"))
+        artists_df, albums_df = artists_future.result(), albums_future.result()
 
     # performing pandas methods on the loaded dataframes
     artists_df.head()
@@ -188,20 +694,29 @@ def main():
     artists_df.add_index("id", ["id"])
     # here, a new index, 'album' is set combining the values of columns: 'name', 'artist_id', and 'release_date'
     albums_df.add_index("album", ["name","artist_id", "release_date"])
-    artists_df.sort("name")
 
     # creating engine to be used
-    engine = db_engine("127.0.0.1:3306", "root", "mysql")
-    # open the engine connection
-    engine.connect()
-    db_create_tables(engine, drop_first=True)
-    # add engine to artists_df class instance
-    artists_df.engine = engine
-    # load csv file to sql database with matching schema
-    artists_df.load_to_db(engine, "spotify_artists")
-    # add engine to albums_df class instance
-    albums_df.engine = engine
-    albums_df.load_to_db(engine, "spotify_albums")
+    engine = db_engine(db_host, db_user, db_pass, db_name)
+    # the tables have to exist before either load starts
+    with engine.begin() as conn:
+        db_create_tables(conn, drop_first=True)
+    # load csv files to sql database with matching schema. The two tables are independent, so they are loaded
+    # at the same time, each over its own pooled connection and transaction
+    with ThreadPoolExecutor(2) as executor:
+        loads = [executor.submit(artists_df.load_to_db, engine, "spotify_artists", batch_size=5000),
+                 # albums rows are wide (available_markets alone can be kilobytes), so they are sent in smaller batches
+                 executor.submit(albums_df.load_to_db, engine, "spotify_albums", batch_size=500)]
+        for load in loads:
+            # re-raises an exception from either load
+            load.result()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # flags are parsed before pandas/sqlalchemy are imported, so --help and bad arguments return right away
+    parser = argparse.ArgumentParser(description="Load the spotify artists and albums csv files into a MySQL database")
+    parser.add_argument("--host", default="127.0.0.1:3306", help="database host and port (default: %(default)s)")
+    parser.add_argument("--user", default="root", help="database user (default: %(default)s)")
+    parser.add_argument("--password", default="mysql", help="database password (default: %(default)s)")
+    parser.add_argument("--database", default="spotify", help="database name (default: %(default)s)")
+    parser.add_argument("--data-dir", default="./data", help="directory holding the csv files (default: %(default)s)")
+    args = parser.parse_args()
+    main(args.host, args.user, args.password, args.database, args.data_dir)
\ No newline at end of file
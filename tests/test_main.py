@@ -0,0 +1,236 @@
+import contextlib
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+import main
+
+
+def write_albums_csv(path, release_dates):
+    """
+    Writes a small spotify albums csv file, with the leading unnamed index column the real files have
+    """
+    rows = len(release_dates)
+    pd.DataFrame({"album_type": ["album"] * rows,
+                  "artist_id": [f"artist{i % 3}" for i in range(rows)],
+                  "available_markets": ["['AD', 'AE']"] * rows,
+                  "external_urls": ["{}"] * rows,
+                  "href": ["https://api.spotify.com"] * rows,
+                  "id": [f"album{i}" for i in range(rows)],
+                  "images": ["[]"] * rows,
+                  "name": [f"Album {i}" for i in range(rows)],
+                  "release_date": release_dates,
+                  "release_date_precision": ["day"] * rows,
+                  "total_tracks": [i % 12 for i in range(rows)],
+                  "track_id": ["track"] * rows,
+                  "track_name_prev": ["track_0"] * rows,
+                  "uri": ["spotify:album"] * rows,
+                  "type": ["album"] * rows}).to_csv(path)
+
+
+def joined_rows(df, column_names):
+    """
+    Concatenates the columns one row at a time, as add_index originally did
+    """
+    return df[column_names].apply(lambda row: "-".join(row.to_numpy(dtype=object).astype(str)), axis=1).tolist()
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = sa.create_engine("sqlite://")
+    main.db_create_tables(engine, drop_first=True)
+    return engine
+
+
+def test_load_to_db_sqlite(tmp_path, sqlite_engine):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["1998", "2005-03", "2019-11-22"] * 40)
+    albums_df = main.DataLoader(str(csv_path), chunksize=50, dtypes=main.ALBUM_DTYPES, usecols=main.table_columns("spotify_albums"))
+    albums_df.add_index("album", ["name", "artist_id", "release_date"])
+
+    albums_df.load_to_db(sqlite_engine, "spotify_albums", batch_size=20)
+
+    with sqlite_engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT COUNT(*) FROM spotify_albums")).scalar() == 120
+        release_dates = conn.execute(sa.text("SELECT DISTINCT release_date FROM spotify_albums")).scalars()
+        assert sorted(release_dates) == ["1998", "2005-03", "2019-11-22"]
+
+
+def test_load_to_db_sqlite_parsed_dates(tmp_path, sqlite_engine):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["2019-11-22"] * 10)
+    albums_df = main.DataLoader(str(csv_path), dtypes=main.ALBUM_DTYPES, parse_dates=["release_date"])
+
+    albums_df.load_to_db(sqlite_engine, "spotify_albums")
+
+    with sqlite_engine.connect() as conn:
+        release_dates = conn.execute(sa.text("SELECT DISTINCT release_date FROM spotify_albums")).scalars()
+        assert list(release_dates) == ["2019-11-22"]
+
+
+def test_iter_chunks_newlines_in_values(tmp_path, monkeypatch):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["2019-11-22"] * 200)
+    albums = pd.read_csv(csv_path)
+    albums["name"] = [f"Album\n{i}" for i in range(200)]
+    albums.to_csv(csv_path, index=False)
+    # small blocks so quoted newlines cross pyarrow's block boundaries
+    monkeypatch.setattr(main, "ARROW_BLOCK_SIZE", 1 << 10)
+    albums_df = main.DataLoader(str(csv_path), chunksize=50, dtypes=main.ALBUM_DTYPES)
+
+    names = pd.concat(albums_df.iter_chunks())["name"]
+
+    assert names.tolist() == [f"Album\n{i}" for i in range(200)]
+
+
+@pytest.mark.parametrize("dtypes", [None, {"total_tracks": pd.Int16Dtype(), "explicit": "bool"}])
+def test_iter_chunks_pyarrow_matches_pandas(tmp_path, monkeypatch, dtypes):
+    csv_path = tmp_path / "spotify_albums.csv"
+    pd.DataFrame({"name": [f"Album {i}" for i in range(120)],
+                  "total_tracks": [i % 12 for i in range(120)],
+                  "popularity": [i / 4 for i in range(120)],
+                  "explicit": [i % 2 == 0 for i in range(120)]}).to_csv(csv_path, index=False)
+    albums_df = main.DataLoader(str(csv_path), chunksize=50, dtypes=dtypes)
+
+    arrow_chunks = pd.concat(albums_df.iter_chunks())
+    monkeypatch.setattr(main, "_has_pyarrow", lambda: False)
+    pandas_chunks = pd.concat(albums_df.iter_chunks())
+
+    pd.testing.assert_frame_equal(arrow_chunks, pandas_chunks)
+    assert arrow_chunks["explicit"].tolist() == [i % 2 == 0 for i in range(120)]
+
+
+@pytest.mark.parametrize("pyarrow", [True, False])
+def test_iter_chunks_usecols(tmp_path, monkeypatch, caplog, pyarrow):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["2019-11-22"] * 10)
+    monkeypatch.setattr(main, "_has_pyarrow", lambda: pyarrow)
+
+    albums_df = main.DataLoader(str(csv_path), usecols=["name", "popularity", "id"])
+    chunks = pd.concat(albums_df.iter_chunks())
+
+    assert "popularity" in caplog.text
+    assert chunks.columns.tolist() == ["id", "name"]
+
+
+def test_usecols_none_present(tmp_path):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["2019-11-22"] * 10)
+
+    with pytest.raises(ValueError):
+        main.DataLoader(str(csv_path), usecols=["popularity"])
+
+
+@pytest.mark.parametrize("df, column_names", [
+    # all python strings, added together as object arrays
+    (pd.DataFrame({"name": ["Album", "Other"], "artist_id": ["a1", "a2"]}), ["name", "artist_id"]),
+    (pd.DataFrame({"name": ["Album", "Other"], "artist_id": ["a1", "a2"], "release_date": ["1998", "2005-03"]},
+                  dtype=object), ["name", "artist_id", "release_date"]),
+    # two columns that aren't all strings, concatenated with str.cat
+    (pd.DataFrame({"name": ["Album", np.nan], "total_tracks": [12, 3]}), ["name", "total_tracks"]),
+    # three or more columns, added up one at a time
+    (pd.DataFrame({"name": ["Album", "Other"], "artist_id": ["a1", "a2"], "total_tracks": [12, 3]}),
+     ["name", "artist_id", "total_tracks"]),
+    (pd.DataFrame({"a": [1.5, 2.0], "b": [3.25, np.nan], "c": [0.1, 1e20]}), ["a", "b", "c"]),
+    (pd.DataFrame({"a": pd.Series(["x", "y"], dtype="category"), "b": ["p", np.nan],
+                   "c": pd.Series([1, 2], dtype="category")}), ["a", "b", "c"]),
+    (pd.DataFrame({"a": pd.array([1, None], dtype="Int64"), "b": ["p", "q"], "c": [np.nan, "s"]}), ["a", "b", "c"]),
+    # a single column, indexed as it is or as text
+    (pd.DataFrame({"id": ["a1", "a2"]}), ["id"]),
+    (pd.DataFrame({"id": [1, 2]}), ["id"]),
+    (pd.DataFrame({"id": [1.5, np.nan]}), ["id"]),
+    (pd.DataFrame({"id": ["a1", np.nan]}), ["id"]),
+    (pd.DataFrame({"id": pd.array([1, None], dtype="Int64")}), ["id"]),
+    (pd.DataFrame({"id": pd.Series(["a1", "a2"], dtype="category")}), ["id"]),
+])
+def test_add_index_matches_row_join(df, column_names):
+    expected = joined_rows(df, column_names)
+
+    df = main._add_index(df, "album", column_names)
+
+    assert df.index.tolist() == expected
+
+
+def test_add_index_hashed():
+    year_chunk = pd.DataFrame({"name": ["Album"], "release_date": [1998]})
+    text_chunk = pd.DataFrame({"name": ["Album"], "release_date": ["1998"]})
+
+    year_chunk = main._add_index(year_chunk, "album", ["name", "release_date"], hashed=True)
+    text_chunk = main._add_index(text_chunk, "album", ["name", "release_date"], hashed=True)
+
+    assert year_chunk.index.name == "album_hash"
+    assert "album" not in year_chunk.columns
+    assert year_chunk.index.tolist() == text_chunk.index.tolist()
+
+
+def test_add_index_hashed_missing_values():
+    # a chunk where the column is only missing values reads it as floats, another as strings
+    float_chunk = pd.DataFrame({"name": ["Album"], "release_date": [np.nan]})
+    text_chunk = pd.DataFrame({"name": ["Album", "Other"], "release_date": [np.nan, "1998"]})
+
+    float_chunk = main._add_index(float_chunk, "album", ["name", "release_date"], hashed=True)
+    text_chunk = main._add_index(text_chunk, "album", ["name", "release_date"], hashed=True)
+
+    assert float_chunk.index[0] == text_chunk.index[0]
+
+
+def test_load_to_db_local_infile_rejected(tmp_path, sqlite_engine, monkeypatch):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["2019-11-22"] * 10)
+    albums_df = main.DataLoader(str(csv_path), dtypes=main.ALBUM_DTYPES, usecols=main.table_columns("spotify_albums"))
+
+    def rejected(db_engine, table):
+        error = Exception(3948, "Loading local data is disabled; this must be enabled on both the client and server sides")
+        raise sa.exc.OperationalError("LOAD DATA LOCAL INFILE", None, error)
+
+    monkeypatch.setattr(sqlite_engine.dialect, "name", "mysql")
+    monkeypatch.setattr(albums_df, "_load_data_infile", rejected)
+    albums_df.load_to_db(sqlite_engine, "spotify_albums")
+
+    with sqlite_engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT COUNT(*) FROM spotify_albums")).scalar() == 10
+
+
+class FakeMySQLEngine:
+    """
+    Stands in for a MySQL engine, recording the statements it runs and the csv file each LOAD DATA statement reads
+    """
+    dialect = mysql.dialect()
+
+    def __init__(self):
+        self.statements = []
+        self.files = []
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self
+
+    def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+        path = re.search(r"LOCAL INFILE '(.*?)'", statement)
+        if path:
+            with open(path.group(1), newline="") as f:
+                self.files.append(f.read())
+
+
+def test_load_data_infile(tmp_path, monkeypatch):
+    csv_path = tmp_path / "spotify_albums.csv"
+    write_albums_csv(csv_path, ["2019-11-22"] * 3)
+    albums_df = main.DataLoader(str(csv_path), dtypes=main.ALBUM_DTYPES)
+    # the csv readers take "NULL" for a missing value, so the chunk is given as it would reach LOAD DATA
+    chunk = pd.DataFrame({"Unnamed: 0": [0, 1, 2], "name": ["NULL", None, "AC\\DC"], "release_date": ["1998"] * 3})
+    monkeypatch.setattr(albums_df, "iter_chunks", lambda: iter([chunk]))
+    engine = FakeMySQLEngine()
+
+    albums_df._load_data_infile(engine, main.spotify_metadata().tables["spotify_albums"])
+
+    truncate, load = engine.statements
+    assert truncate == "TRUNCATE TABLE spotify_albums"
+    assert "ESCAPED BY '\\\\'" in load
+    # the unnamed index column isn't in the table
+    assert load.endswith("(@skip, name, release_date)")
+    assert engine.files == ["0,NULL,1998\n1,\\N,1998\n2,AC\\\\DC,1998\n"]